@@ -3,29 +3,176 @@ Database models and data access layer for DiskTrend.
 Uses SQLite with async support via aiosqlite.
 """
 
+import asyncio
 import sqlite3
 import aiosqlite
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Optional
+from typing import AsyncIterator, Awaitable, Callable, Optional
 from contextlib import asynccontextmanager
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Per-connection settings applied once when a pooled connection is opened.
+# File-level settings (page size, auto_vacuum, WAL) are set in _init_sync.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=30000000000",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+)
+
+# Timestamps are produced by SQLite in the same local ISO-8601 form the
+# columns have always held; CUTOFF_SQL takes a modifier such as '-30 days'
+NOW_SQL = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+CUTOFF_SQL = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime', ?)"
+
+# Columns returned by the read queries, so rows stay as small as possible
+SNAPSHOT_COLUMNS = ("id, mount_point, started_at, completed_at, "
+                    "total_size, total_files, total_dirs, status")
+ENTRY_COLUMNS = ("path, name, size, file_count, dir_count, depth, "
+                 "parent_path, is_dir")
+ERROR_COLUMNS = "id, snapshot_id, path, error_type, error_message, timestamp"
+
+# Row layout: (snapshot_id, path, name, size, file_count, dir_count,
+#              depth, parent_path, is_dir, error)
+# Constant text, so the long-lived writer's sqlite3 statement cache keeps
+# the prepared INSERT across every executemany batch
+INSERT_ENTRY_SQL = """INSERT INTO entries
+    (snapshot_id, path, name, size, file_count, dir_count,
+     depth, parent_path, is_dir, error)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+# Row layout: (snapshot_id, path, error_type, error_message)
+INSERT_ERROR_SQL = """INSERT INTO scan_errors
+    (snapshot_id, path, error_type, error_message)
+    VALUES (?, ?, ?, ?)"""
+
+
+class ConnectionPool:
+    """Fixed-size pool of long-lived aiosqlite connections, opened lazily."""
+
+    def __init__(self, connect: Callable[[], Awaitable[aiosqlite.Connection]],
+                 size: int):
+        self._connect = connect
+        self.size = max(1, size)
+        # Holds idle connections, plus None for each free slot left by a
+        # dropped connection so that a waiting acquire() opens a new one
+        self._idle: asyncio.Queue[Optional[aiosqlite.Connection]] = asyncio.Queue()
+        self._conns: set[aiosqlite.Connection] = set()
+        self._opened = 0
+        self._waiting = 0
+        self._closed = False
+
+    async def acquire(self) -> aiosqlite.Connection:
+        """Check out a connection, opening one if the pool has room."""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        if self._idle.empty() and self._opened < self.size:
+            self._opened += 1
+            return await self._open()
+        self._waiting += 1
+        try:
+            conn = await self._idle.get()
+        finally:
+            self._waiting -= 1
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        if conn is None:
+            return await self._open()
+        return conn
+
+    async def _open(self) -> aiosqlite.Connection:
+        """Open a connection into a slot the caller has already reserved."""
+        try:
+            conn = await self._connect()
+        except BaseException:
+            # Pass the slot on so the next acquire() retries the open
+            self._idle.put_nowait(None)
+            raise
+        if self._closed:
+            # The pool closed while this connection was opening
+            await conn.close()
+            raise RuntimeError("Connection pool is closed")
+        self._conns.add(conn)
+        return conn
+
+    async def release(self, conn: aiosqlite.Connection):
+        """Return a connection to the pool, discarding any open transaction."""
+        if conn not in self._conns:
+            # Already closed along with the pool
+            return
+        try:
+            if conn.in_transaction:
+                await conn.rollback()
+        except Exception:
+            logger.exception("Dropping broken pooled connection")
+            self._conns.discard(conn)
+            self._idle.put_nowait(None)
+            try:
+                await conn.close()
+            except Exception:
+                pass
+            return
+        self._idle.put_nowait(conn)
+
+    async def close(self):
+        """Close every connection the pool opened, idle or checked out.
+
+        Later acquire() calls raise, as do any already waiting for a
+        connection.
+        """
+        self._closed = True
+        conns, self._conns = self._conns, set()
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for _ in range(self._waiting):
+            self._idle.put_nowait(None)
+        for conn in conns:
+            await conn.close()
+
 
 class Database:
-    """SQLite database manager with connection pooling."""
+    """SQLite database manager with connection pooling.
+
+    Reads share a pool of read-only connections, which WAL lets run
+    alongside a writer. All writes go through a single dedicated
+    connection, so writers queue in asyncio rather than on SQLite's lock.
+    """
 
-    def __init__(self, db_path: str):
+    STREAM_CHUNK_SIZE = 1000  # Rows fetched per step when streaming entries
+
+    def __init__(self, db_path: str, pool_size: int = 5):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # At least two readers, so one is always left over for requests
+        # while entry streams hold the rest
+        self._readers = ConnectionPool(
+            lambda: self._connect(read_only=True), max(2, pool_size)
+        )
+        self._writer = ConnectionPool(self._connect, 1)
+        # Streams hold a reader for as long as the client takes to download,
+        # so they get one reader fewer than the pool and never starve it
+        self._stream_slots = asyncio.Semaphore(self._readers.size - 1)
         self._init_sync()
 
     def _init_sync(self):
         """Initialize database schema synchronously (for startup)."""
         conn = sqlite3.connect(self.db_path)
         try:
+            # Page size and auto_vacuum only take effect before the first
+            # table is created, so they are applied to new databases only
+            is_new = conn.execute(
+                "SELECT COUNT(*) FROM sqlite_master"
+            ).fetchone()[0] == 0
+            if is_new:
+                conn.execute("PRAGMA page_size=8192")
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+
             conn.executescript("""
                 -- Snapshots table: records each scan session
                 CREATE TABLE IF NOT EXISTS snapshots (
@@ -66,36 +213,80 @@ class Database:
                     FOREIGN KEY (snapshot_id) REFERENCES snapshots(id) ON DELETE CASCADE
                 );
 
-                -- Indexes for performance
-                CREATE INDEX IF NOT EXISTS idx_entries_snapshot ON entries(snapshot_id);
-                CREATE INDEX IF NOT EXISTS idx_entries_path ON entries(path);
-                CREATE INDEX IF NOT EXISTS idx_entries_parent ON entries(parent_path);
+                -- Indexes for performance, shaped after the read queries.
+                -- Superseded single-column indexes are dropped on upgrade.
+                DROP INDEX IF EXISTS idx_entries_snapshot;
+                DROP INDEX IF EXISTS idx_entries_path;
+                DROP INDEX IF EXISTS idx_entries_parent;
+                CREATE INDEX IF NOT EXISTS idx_entries_snap_parent
+                    ON entries(snapshot_id, parent_path, size DESC);
+                CREATE INDEX IF NOT EXISTS idx_entries_path_snap
+                    ON entries(path, snapshot_id);
                 CREATE INDEX IF NOT EXISTS idx_entries_depth ON entries(snapshot_id, depth);
                 CREATE INDEX IF NOT EXISTS idx_entries_snapshot_path ON entries(snapshot_id, path);
                 CREATE INDEX IF NOT EXISTS idx_snapshots_mount ON snapshots(mount_point);
                 CREATE INDEX IF NOT EXISTS idx_snapshots_time ON snapshots(completed_at);
+                CREATE INDEX IF NOT EXISTS idx_snapshots_running
+                    ON snapshots(started_at DESC) WHERE status = 'running';
+                CREATE INDEX IF NOT EXISTS idx_snapshots_completed_time
+                    ON snapshots(completed_at DESC) WHERE status = 'completed';
             """)
+
+            # Foreign keys were not enforced before schema version 1, so
+            # deleted snapshots left their entries and errors behind.
+            # Purge those once; cascades keep them away from then on.
+            if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+                conn.executescript("""
+                    DELETE FROM entries
+                        WHERE snapshot_id NOT IN (SELECT id FROM snapshots);
+                    DELETE FROM scan_errors
+                        WHERE snapshot_id NOT IN (SELECT id FROM snapshots);
+                    PRAGMA user_version = 1;
+                """)
             conn.commit()
         finally:
             conn.close()
 
+    async def _connect(self, read_only: bool = False) -> aiosqlite.Connection:
+        """Open a new connection configured for pooled use."""
+        conn = await aiosqlite.connect(self.db_path, cached_statements=256)
+        for pragma in CONNECTION_PRAGMAS:
+            await conn.execute(pragma)
+        if read_only:
+            await conn.execute("PRAGMA query_only=ON")
+        conn.row_factory = aiosqlite.Row
+        return conn
+
     @asynccontextmanager
     async def connection(self):
-        """Get an async database connection."""
-        conn = await aiosqlite.connect(self.db_path)
-        conn.row_factory = aiosqlite.Row
+        """Get a read-only async database connection from the pool."""
+        conn = await self._readers.acquire()
         try:
             yield conn
         finally:
-            await conn.close()
+            await self._readers.release(conn)
+
+    @asynccontextmanager
+    async def write_connection(self):
+        """Get the dedicated write connection; the caller commits."""
+        conn = await self._writer.acquire()
+        try:
+            yield conn
+        finally:
+            await self._writer.release(conn)
+
+    async def close(self):
+        """Close all pooled connections, including checked-out ones."""
+        await self._readers.close()
+        await self._writer.close()
 
     async def create_snapshot(self, mount_point: str) -> int:
         """Create a new snapshot record and return its ID."""
-        async with self.connection() as conn:
+        async with self.write_connection() as conn:
             cursor = await conn.execute(
-                """INSERT INTO snapshots (mount_point, started_at, status)
-                   VALUES (?, ?, 'running')""",
-                (mount_point, datetime.now().isoformat())
+                f"""INSERT INTO snapshots (mount_point, started_at, status)
+                   VALUES (?, {NOW_SQL}, 'running')""",
+                (mount_point,)
             )
             await conn.commit()
             return cursor.lastrowid
@@ -103,85 +294,158 @@ class Database:
     async def complete_snapshot(self, snapshot_id: int, total_size: int,
                                  total_files: int, total_dirs: int):
         """Mark a snapshot as completed."""
-        async with self.connection() as conn:
+        async with self.write_connection() as conn:
             await conn.execute(
-                """UPDATE snapshots
-                   SET completed_at = ?, total_size = ?, total_files = ?,
+                f"""UPDATE snapshots
+                   SET completed_at = {NOW_SQL}, total_size = ?, total_files = ?,
                        total_dirs = ?, status = 'completed'
                    WHERE id = ?""",
-                (datetime.now().isoformat(), total_size, total_files,
-                 total_dirs, snapshot_id)
+                (total_size, total_files, total_dirs, snapshot_id)
             )
             await conn.commit()
 
+            # A snapshot adds a large batch of rows: refresh planner stats
+            # and checkpoint the WAL without blocking readers. ANALYZE is
+            # explicit because PRAGMA optimize on this connection would skip
+            # entries (before SQLite 3.46 it only looks at tables the same
+            # connection queried); analysis_limit keeps it to a sample.
+            await conn.execute("PRAGMA analysis_limit=1000")
+            await conn.execute("ANALYZE")
+            await conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
     async def fail_snapshot(self, snapshot_id: int, error: str):
-        """Mark a snapshot as failed."""
-        async with self.connection() as conn:
+        """Mark a snapshot as failed and record why, in one transaction."""
+        async with self.write_connection() as conn:
+            # Take the write lock up front so both statements commit together
+            await conn.execute("BEGIN IMMEDIATE")
             await conn.execute(
-                """UPDATE snapshots
-                   SET completed_at = ?, status = 'failed'
+                f"""UPDATE snapshots
+                   SET completed_at = {NOW_SQL}, status = 'failed'
                    WHERE id = ?""",
-                (datetime.now().isoformat(), snapshot_id)
+                (snapshot_id,)
             )
             await conn.execute(
-                """INSERT INTO scan_errors (snapshot_id, path, error_type, error_message)
-                   VALUES (?, '/', 'FATAL', ?)""",
-                (snapshot_id, error)
+                INSERT_ERROR_SQL, (snapshot_id, '/', 'FATAL', error)
             )
             await conn.commit()
 
-    async def insert_entries_batch(self, snapshot_id: int, entries: list[dict]):
-        """Insert multiple directory entries in a single transaction."""
-        if not entries:
+    @asynccontextmanager
+    async def _committing(self, conn: aiosqlite.Connection = None):
+        """Yield ``conn`` if given, else the write connection committed on exit."""
+        if conn is not None:
+            yield conn
             return
-        async with self.connection() as conn:
-            await conn.executemany(
-                """INSERT INTO entries
-                   (snapshot_id, path, name, size, file_count, dir_count,
-                    depth, parent_path, is_dir, error)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                [(snapshot_id, e['path'], e['name'], e['size'],
-                  e['file_count'], e['dir_count'], e['depth'],
-                  e['parent_path'], e['is_dir'], e.get('error'))
-                 for e in entries]
-            )
+        async with self.write_connection() as conn:
+            yield conn
             await conn.commit()
 
+    async def begin_snapshot_tx(self, snapshot_id: int) -> aiosqlite.Connection:
+        """Open a write transaction for streaming a snapshot's rows.
+
+        The returned write connection stays checked out until it is handed
+        to commit_snapshot_tx() or rollback_snapshot_tx(), so other writes
+        wait for the scan rather than contending for SQLite's lock.
+        """
+        conn = await self._writer.acquire()
+        try:
+            await conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            await self._writer.release(conn)
+            raise
+        logger.debug(f"Opened write transaction for snapshot {snapshot_id}")
+        return conn
+
+    async def commit_snapshot_tx(self, conn: aiosqlite.Connection,
+                                 keep_open: bool = False):
+        """Commit a snapshot transaction.
+
+        With keep_open, a new transaction is started on the same connection
+        so the caller can keep streaming rows; otherwise it is released.
+        """
+        await conn.commit()
+        if keep_open:
+            await conn.execute("BEGIN IMMEDIATE")
+        else:
+            await self._writer.release(conn)
+
+    async def rollback_snapshot_tx(self, conn: aiosqlite.Connection):
+        """Discard a snapshot transaction and release its connection."""
+        await self._writer.release(conn)
+
+    async def insert_entries_batch(self, entries: list[tuple],
+                                   conn: aiosqlite.Connection = None):
+        """Insert multiple directory entries, laid out as INSERT_ENTRY_SQL rows.
+
+        If conn is an open snapshot transaction the rows are left
+        uncommitted; otherwise they are committed in their own transaction.
+        """
+        if not entries:
+            return
+        async with self._committing(conn) as conn:
+            await conn.executemany(INSERT_ENTRY_SQL, entries)
+
+    async def insert_errors_batch(self, errors: list[tuple],
+                                  conn: aiosqlite.Connection = None):
+        """Insert multiple scan errors, laid out as INSERT_ERROR_SQL rows."""
+        if not errors:
+            return
+        async with self._committing(conn) as conn:
+            await conn.executemany(INSERT_ERROR_SQL, errors)
+
     async def log_error(self, snapshot_id: int, path: str,
                         error_type: str, message: str):
-        """Log a scan error."""
-        async with self.connection() as conn:
+        """Log a single scan error."""
+        async with self._committing() as conn:
             await conn.execute(
-                """INSERT INTO scan_errors (snapshot_id, path, error_type, error_message)
-                   VALUES (?, ?, ?, ?)""",
-                (snapshot_id, path, error_type, message)
+                INSERT_ERROR_SQL, (snapshot_id, path, error_type, message)
             )
-            await conn.commit()
+
+    @staticmethod
+    async def _fetch_dicts(conn: aiosqlite.Connection, query: str,
+                           params=()) -> list[dict]:
+        """Run a query and build result dicts from plain tuple rows."""
+        cursor = await conn.cursor()
+        cursor.row_factory = None
+        await cursor.execute(query, params)
+        rows = await cursor.fetchall()
+        columns = [column[0] for column in cursor.description]
+        await cursor.close()
+        return [dict(zip(columns, row)) for row in rows]
 
     async def get_latest_snapshot(self, mount_point: str = None) -> Optional[dict]:
         """Get the most recent completed snapshot."""
         async with self.connection() as conn:
             if mount_point:
                 cursor = await conn.execute(
-                    """SELECT * FROM snapshots
+                    f"""SELECT {SNAPSHOT_COLUMNS} FROM snapshots
                        WHERE mount_point = ? AND status = 'completed'
                        ORDER BY completed_at DESC LIMIT 1""",
                     (mount_point,)
                 )
             else:
                 cursor = await conn.execute(
-                    """SELECT * FROM snapshots
+                    f"""SELECT {SNAPSHOT_COLUMNS} FROM snapshots
                        WHERE status = 'completed'
                        ORDER BY completed_at DESC LIMIT 1"""
                 )
             row = await cursor.fetchone()
             return dict(row) if row else None
 
+    async def get_snapshot_by_id(self, snapshot_id: int) -> Optional[dict]:
+        """Get a snapshot by id, whatever its status."""
+        async with self.connection() as conn:
+            cursor = await conn.execute(
+                f"SELECT {SNAPSHOT_COLUMNS} FROM snapshots WHERE id = ?",
+                (snapshot_id,)
+            )
+            row = await cursor.fetchone()
+            return dict(row) if row else None
+
     async def get_snapshots(self, mount_point: str = None,
                             days: int = None, limit: int = 100) -> list[dict]:
         """Get snapshot history."""
         async with self.connection() as conn:
-            query = "SELECT * FROM snapshots WHERE status = 'completed'"
+            query = f"SELECT {SNAPSHOT_COLUMNS} FROM snapshots WHERE status = 'completed'"
             params = []
 
             if mount_point:
@@ -189,42 +453,67 @@ class Database:
                 params.append(mount_point)
 
             if days:
-                cutoff = (datetime.now() - timedelta(days=days)).isoformat()
-                query += " AND completed_at >= ?"
-                params.append(cutoff)
+                query += f" AND completed_at >= {CUTOFF_SQL}"
+                params.append(f"-{days} days")
 
             query += " ORDER BY completed_at DESC LIMIT ?"
             params.append(limit)
 
-            cursor = await conn.execute(query, params)
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+            return await self._fetch_dicts(conn, query, params)
+
+    @staticmethod
+    def _entries_query(snapshot_id: int, parent_path: str = None,
+                       depth: int = None) -> tuple[str, list]:
+        """Build the entry listing query for a snapshot, largest first."""
+        query = f"SELECT {ENTRY_COLUMNS} FROM entries WHERE snapshot_id = ?"
+        params = [snapshot_id]
+
+        if parent_path is not None:
+            query += " AND parent_path = ?"
+            params.append(parent_path)
+
+        if depth is not None:
+            query += " AND depth = ?"
+            params.append(depth)
+
+        query += " ORDER BY size DESC"
+        return query, params
 
     async def get_entries(self, snapshot_id: int, parent_path: str = None,
                           depth: int = None) -> list[dict]:
         """Get directory entries for a snapshot."""
+        query, params = self._entries_query(snapshot_id, parent_path, depth)
         async with self.connection() as conn:
-            query = "SELECT * FROM entries WHERE snapshot_id = ?"
-            params = [snapshot_id]
+            return await self._fetch_dicts(conn, query, params)
 
-            if parent_path is not None:
-                query += " AND parent_path = ?"
-                params.append(parent_path)
+    async def iter_entries(self, snapshot_id: int, parent_path: str = None,
+                           depth: int = None) -> AsyncIterator[list[dict]]:
+        """Yield directory entries for a snapshot in chunks, largest first.
 
-            if depth is not None:
-                query += " AND depth = ?"
-                params.append(depth)
-
-            query += " ORDER BY size DESC"
-            cursor = await conn.execute(query, params)
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        Only one chunk is held in memory at a time; the reader connection
+        stays checked out until the generator finishes or is closed, and
+        at most pool_size - 1 streams run at once.
+        """
+        query, params = self._entries_query(snapshot_id, parent_path, depth)
+        async with self._stream_slots, self.connection() as conn:
+            cursor = await conn.cursor()
+            cursor.row_factory = None
+            try:
+                await cursor.execute(query, params)
+                columns = [column[0] for column in cursor.description]
+                while True:
+                    rows = await cursor.fetchmany(self.STREAM_CHUNK_SIZE)
+                    if not rows:
+                        break
+                    yield [dict(zip(columns, row)) for row in rows]
+            finally:
+                await cursor.close()
 
     async def get_entry_by_path(self, snapshot_id: int, path: str) -> Optional[dict]:
         """Get a specific entry by path."""
         async with self.connection() as conn:
             cursor = await conn.execute(
-                """SELECT * FROM entries
+                f"""SELECT {ENTRY_COLUMNS} FROM entries
                    WHERE snapshot_id = ? AND path = ?""",
                 (snapshot_id, path)
             )
@@ -234,19 +523,17 @@ class Database:
     async def get_path_history(self, path: str, days: int = 30) -> list[dict]:
         """Get size history for a specific path across snapshots."""
         async with self.connection() as conn:
-            cutoff = (datetime.now() - timedelta(days=days)).isoformat()
-            cursor = await conn.execute(
-                """SELECT e.size, e.file_count, e.dir_count,
+            return await self._fetch_dicts(
+                conn,
+                f"""SELECT e.size, e.file_count, e.dir_count,
                           s.completed_at, s.id as snapshot_id
                    FROM entries e
                    JOIN snapshots s ON e.snapshot_id = s.id
                    WHERE e.path = ? AND s.status = 'completed'
-                         AND s.completed_at >= ?
+                         AND s.completed_at >= {CUTOFF_SQL}
                    ORDER BY s.completed_at ASC""",
-                (path, cutoff)
+                (path, f"-{days} days")
             )
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
 
     async def get_top_growth(self, limit: int = 10, max_depth: int = 4) -> list[dict]:
         """Get directories with largest growth since last scan.
@@ -257,14 +544,18 @@ class Database:
         """
         async with self.connection() as conn:
             cursor = await conn.execute(
-                """WITH recent AS (
-                       SELECT id FROM snapshots
-                       WHERE status = 'completed'
-                       ORDER BY completed_at DESC LIMIT 2
-                   ),
-                   latest AS (SELECT id FROM recent LIMIT 1),
-                   previous AS (SELECT id FROM recent LIMIT 1 OFFSET 1)
-                   SELECT
+                """SELECT id FROM snapshots
+                   WHERE status = 'completed'
+                   ORDER BY completed_at DESC LIMIT 2"""
+            )
+            recent = await cursor.fetchall()
+            if len(recent) < 2:
+                return []
+            latest_id, previous_id = recent[0]['id'], recent[1]['id']
+
+            return await self._fetch_dicts(
+                conn,
+                """SELECT
                        curr.path,
                        curr.name,
                        curr.size as current_size,
@@ -276,23 +567,21 @@ class Database:
                        END as growth_percent
                    FROM entries curr
                    LEFT JOIN entries prev ON curr.path = prev.path
-                        AND prev.snapshot_id = (SELECT id FROM previous)
-                   WHERE curr.snapshot_id = (SELECT id FROM latest)
+                        AND prev.snapshot_id = ?
+                   WHERE curr.snapshot_id = ?
                          AND curr.is_dir = 1
                          AND curr.depth <= ?
-                         AND (curr.size - COALESCE(prev.size, 0)) > 0
+                         AND curr.size > COALESCE(prev.size, 0)
                    ORDER BY growth DESC
                    LIMIT ?""",
-                (max_depth, limit)
+                (previous_id, latest_id, max_depth, limit)
             )
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
 
     async def get_running_snapshot(self) -> Optional[dict]:
         """Check if there's a scan currently running."""
         async with self.connection() as conn:
             cursor = await conn.execute(
-                """SELECT * FROM snapshots WHERE status = 'running'
+                f"""SELECT {SNAPSHOT_COLUMNS} FROM snapshots WHERE status = 'running'
                    ORDER BY started_at DESC LIMIT 1"""
             )
             row = await cursor.fetchone()
@@ -302,23 +591,27 @@ class Database:
         """Remove snapshots older than retention period."""
         if retention_days <= 0:
             return
-        async with self.connection() as conn:
-            cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+        async with self.write_connection() as conn:
             await conn.execute(
-                """DELETE FROM snapshots WHERE completed_at < ?""",
-                (cutoff,)
+                f"""DELETE FROM snapshots WHERE completed_at < {CUTOFF_SQL}""",
+                (f"-{retention_days} days",)
             )
             await conn.commit()
+
+            # Reclaim a bounded number of freed pages and shrink the WAL
+            # after the bulk delete. executescript steps the pragma to
+            # completion; a plain execute would free only a single page.
+            await conn.executescript("PRAGMA incremental_vacuum(1000)")
+            await conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
             logger.info(f"Cleaned up snapshots older than {retention_days} days")
 
     async def get_scan_errors(self, snapshot_id: int, limit: int = 100) -> list[dict]:
         """Get errors for a specific snapshot."""
         async with self.connection() as conn:
-            cursor = await conn.execute(
-                """SELECT * FROM scan_errors
+            return await self._fetch_dicts(
+                conn,
+                f"""SELECT {ERROR_COLUMNS} FROM scan_errors
                    WHERE snapshot_id = ?
                    ORDER BY timestamp DESC LIMIT ?""",
                 (snapshot_id, limit)
             )
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
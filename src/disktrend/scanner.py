@@ -5,6 +5,7 @@ Handles recursive directory traversal and size calculation.
 
 import os
 import asyncio
+import threading
 from pathlib import Path
 from datetime import datetime
 from typing import Callable, Optional
@@ -15,10 +16,40 @@ from .models import Database
 logger = logging.getLogger(__name__)
 
 
+def _aggregate_dir(path: str) -> tuple[int, int, list, list]:
+    """
+    List a single directory.
+    Returns (total file size, file count, subdirectory DirEntries,
+    [(path, OSError)] for entries that could not be stat'ed).
+    Raises OSError if the directory itself cannot be read.
+    """
+    # Totals are kept in locals and returned once per directory; DirEntry
+    # caches the type and lstat data returned by the directory read
+    size = 0
+    file_count = 0
+    subdirs = []
+    errors = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry)
+                    continue
+                size += entry.stat(follow_symlinks=False).st_size
+            except OSError as e:
+                errors.append((entry.path, e))
+                continue
+            file_count += 1
+    return size, file_count, subdirs, errors
+
+
 class DiskScanner:
     """High-performance disk scanner with error handling."""
 
     BATCH_SIZE = 1000  # Number of entries to batch before DB insert
+    COMMIT_EVERY = 50  # Batches per commit, caps WAL growth on large scans
+    ERROR_BATCH_SIZE = 500  # Number of errors to batch before DB insert
+    QUEUE_SIZE = 8  # Batches buffered between the walker thread and DB writer
 
     def __init__(self, db: Database, skip_paths: list[str] = None,
                  max_depth: int = 0):
@@ -33,6 +64,12 @@ class DiskScanner:
         }
         self.skip_paths.update(self.default_skip)
 
+        # Prefixes for matching paths under a skip directory in one C call
+        self._skip_prefixes = tuple(
+            skip.rstrip('/') + '/' for skip in self.skip_paths
+            if skip.rstrip('/')
+        )
+
         # Scan state
         self._running = False
         self._cancelled = False
@@ -52,21 +89,8 @@ class DiskScanner:
 
     def _should_skip(self, path: str) -> bool:
         """Check if path should be skipped."""
-        # Exact match
-        if path in self.skip_paths:
-            return True
-        # Check if path is under a skip directory
-        for skip in self.skip_paths:
-            if path.startswith(skip + '/'):
-                return True
-        return False
-
-    def _get_depth(self, path: str, base_path: str) -> int:
-        """Calculate depth relative to base path."""
-        if path == base_path:
-            return 0
-        rel_path = os.path.relpath(path, base_path)
-        return len(rel_path.split(os.sep))
+        # Exact match, or path is under a skip directory
+        return path in self.skip_paths or path.startswith(self._skip_prefixes)
 
     async def scan(self, mount_point: str) -> dict:
         """
@@ -79,6 +103,7 @@ class DiskScanner:
         self._running = True
         self._cancelled = False
         snapshot_id = None
+        tx = None
 
         stats = {
             'total_size': 0,
@@ -101,87 +126,46 @@ class DiskScanner:
             snapshot_id = await self.db.create_snapshot(mount_point)
             logger.info(f"Created snapshot {snapshot_id}")
 
-            # Dictionary to accumulate directory sizes
-            dir_sizes: dict[str, dict] = {}
-            entries_batch: list[dict] = []
-
-            # Walk the directory tree
-            for root, dirs, files in os.walk(mount_point, topdown=False,
-                                             onerror=self._walk_error_handler):
-                if self._cancelled:
-                    logger.warning("Scan cancelled by user")
-                    break
-
-                if self._should_skip(root):
-                    continue
+            # All rows for this snapshot go through one write transaction
+            tx = await self.db.begin_snapshot_tx(snapshot_id)
+            batches_since_commit = 0
+
+            # Walk in a worker thread so directory reads overlap with
+            # SQLite writes; batches flow through a bounded queue
+            loop = asyncio.get_running_loop()
+            queue: asyncio.Queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+            stop = threading.Event()
+
+            def emit(item):
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+            walker = asyncio.ensure_future(asyncio.to_thread(
+                self._walk_sync, mount_point, snapshot_id, stats, emit, stop
+            ))
+            try:
+                while (item := await queue.get()) is not None:
+                    entries_batch, errors_batch, progress = item
+                    await self.db.insert_entries_batch(entries_batch, conn=tx)
+                    await self.db.insert_errors_batch(errors_batch, conn=tx)
+
+                    batches_since_commit += 1
+                    if batches_since_commit >= self.COMMIT_EVERY:
+                        await self.db.commit_snapshot_tx(tx, keep_open=True)
+                        batches_since_commit = 0
 
-                depth = self._get_depth(root, mount_point)
-                if self.max_depth > 0 and depth > self.max_depth:
-                    continue
-
-                # Initialize directory entry
-                dir_entry = {
-                    'path': root,
-                    'name': os.path.basename(root) or root,
-                    'size': 0,
-                    'file_count': 0,
-                    'dir_count': 0,
-                    'depth': depth,
-                    'parent_path': os.path.dirname(root) if root != mount_point else None,
-                    'is_dir': 1
-                }
-
-                # Process files in this directory
-                for filename in files:
-                    filepath = os.path.join(root, filename)
-                    try:
-                        # Use lstat to not follow symlinks
-                        stat_info = os.lstat(filepath)
-                        file_size = stat_info.st_size
-                        dir_entry['size'] += file_size
-                        dir_entry['file_count'] += 1
-                        stats['total_files'] += 1
-                        stats['total_size'] += file_size
-                    except (OSError, PermissionError) as e:
-                        stats['errors'] += 1
-                        await self.db.log_error(
-                            snapshot_id, filepath,
-                            type(e).__name__, str(e)
-                        )
-
-                # Add sizes from subdirectories (bottom-up traversal)
-                for dirname in dirs:
-                    dirpath = os.path.join(root, dirname)
-                    if dirpath in dir_sizes:
-                        subdir = dir_sizes[dirpath]
-                        dir_entry['size'] += subdir['size']
-                        dir_entry['file_count'] += subdir['file_count']
-                        dir_entry['dir_count'] += subdir['dir_count'] + 1
-
-                # Store for parent calculation
-                dir_sizes[root] = dir_entry
-                stats['total_dirs'] += 1
-
-                # Add to batch
-                entries_batch.append(dir_entry)
+                    # Progress callback
+                    if progress and self._progress_callback:
+                        await self._maybe_call_progress(progress)
 
-                # Flush batch if needed
-                if len(entries_batch) >= self.BATCH_SIZE:
-                    await self.db.insert_entries_batch(snapshot_id, entries_batch)
-                    entries_batch.clear()
+                # Re-raise anything the walker failed with
+                await walker
+            except BaseException:
+                stop.set()
+                await self._drain_walker(queue, walker)
+                raise
 
-                    # Progress callback
-                    if self._progress_callback:
-                        await self._maybe_call_progress({
-                            'current_path': root,
-                            'dirs_scanned': stats['total_dirs'],
-                            'files_scanned': stats['total_files'],
-                            'size_scanned': stats['total_size']
-                        })
-
-            # Flush remaining entries
-            if entries_batch:
-                await self.db.insert_entries_batch(snapshot_id, entries_batch)
+            await self.db.commit_snapshot_tx(tx)
+            tx = None
 
             stats['completed_at'] = datetime.now()
 
@@ -201,8 +185,18 @@ class DiskScanner:
             else:
                 await self.db.fail_snapshot(snapshot_id, "Cancelled by user")
 
+        except asyncio.CancelledError:
+            # Shutdown mid-scan: don't leave the snapshot marked running
+            logger.warning(f"Scan of {mount_point} cancelled")
+            if tx is not None:
+                await self.db.rollback_snapshot_tx(tx)
+            if snapshot_id:
+                await self.db.fail_snapshot(snapshot_id, "Cancelled by shutdown")
+            raise
         except Exception as e:
             logger.exception(f"Scan failed: {e}")
+            if tx is not None:
+                await self.db.rollback_snapshot_tx(tx)
             if snapshot_id:
                 await self.db.fail_snapshot(snapshot_id, str(e))
             raise
@@ -211,8 +205,113 @@ class DiskScanner:
 
         return stats
 
+    def _walk_sync(self, mount_point: str, snapshot_id: int, stats: dict,
+                   emit: Callable, stop: threading.Event):
+        """
+        Walk the mount point in a worker thread.
+        Calls emit((entries, errors, progress)) for every batch and
+        emit(None) once the walk is over.
+        """
+        entries_batch: list[tuple] = []
+        errors_batch: list[tuple] = []
+
+        try:
+            # Iterative post-order DFS over os.scandir. Each directory is
+            # pushed twice: first to list it (frame is None), then, once all
+            # of its children have been emitted, to emit it and fold its
+            # totals into the parent's frame. Only frames of directories on
+            # the current path are alive, so memory is O(depth), not O(dirs).
+            # A frame is [size, file_count, dir_count, depth, path].
+            stack: list[tuple[str, str, Optional[list], Optional[list]]] = [
+                (mount_point, os.path.basename(mount_point) or mount_point,
+                 None, None)
+            ]
+            while stack:
+                if self._cancelled:
+                    logger.warning("Scan cancelled by user")
+                    break
+                if stop.is_set():
+                    return
+
+                root, name, parent, frame = stack.pop()
+
+                if frame is None:
+                    if self._should_skip(root):
+                        continue
+
+                    depth = parent[3] + 1 if parent is not None else 0
+
+                    try:
+                        size, file_count, subdirs, errors = _aggregate_dir(root)
+                    except OSError as e:
+                        self._walk_error_handler(e)
+                        continue
+
+                    frame = [size, file_count, 0, depth, root]
+                    stats['total_files'] += file_count
+                    stats['total_size'] += size
+                    if errors:
+                        stats['errors'] += len(errors)
+                        errors_batch.extend(
+                            (snapshot_id, path, type(e).__name__, str(e))
+                            for path, e in errors
+                        )
+
+                    stack.append((root, name, parent, frame))
+                    if self.max_depth <= 0 or depth < self.max_depth:
+                        stack.extend((entry.path, entry.name, frame, None)
+                                     for entry in subdirs)
+                    continue
+
+                # All subdirectories are done: roll totals up (bottom-up)
+                size, file_count, dir_count, depth, _ = frame
+                if parent is not None:
+                    parent[0] += size
+                    parent[1] += file_count
+                    parent[2] += dir_count + 1
+
+                # Children share the parent frame's path string as parent_path
+                parent_path = parent[4] if parent is not None else None
+                stats['total_dirs'] += 1
+
+                # Add to batch as a ready-to-insert row
+                entries_batch.append((
+                    snapshot_id, root, name, size, file_count, dir_count,
+                    depth, parent_path, 1, None
+                ))
+
+                # Hand off batch if needed
+                if (len(entries_batch) >= self.BATCH_SIZE
+                        or len(errors_batch) >= self.ERROR_BATCH_SIZE):
+                    emit((entries_batch, errors_batch, {
+                        'current_path': root,
+                        'dirs_scanned': stats['total_dirs'],
+                        'files_scanned': stats['total_files'],
+                        'size_scanned': stats['total_size']
+                    }))
+                    entries_batch = []
+                    errors_batch = []
+
+            # Hand off remaining entries
+            if entries_batch or errors_batch:
+                emit((entries_batch, errors_batch, None))
+        finally:
+            if not stop.is_set():
+                emit(None)
+
+    @staticmethod
+    async def _drain_walker(queue: asyncio.Queue, walker: asyncio.Future):
+        """Unblock a walker stuck on a full queue and wait for it to stop."""
+        while not walker.done():
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                await asyncio.sleep(0.01)
+        if not walker.cancelled():
+            walker.exception()
+
     def _walk_error_handler(self, error: OSError):
-        """Handle errors during os.walk."""
+        """Handle errors listing a directory."""
         logger.warning(f"Walk error: {error}")
 
     async def _maybe_call_progress(self, data: dict):
@@ -226,11 +325,10 @@ class DiskScanner:
     @staticmethod
     def _format_size(size: int) -> str:
         """Format size in human-readable format."""
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if abs(size) < 1024.0:
-                return f"{size:.2f} {unit}"
-            size /= 1024.0
-        return f"{size:.2f} PB"
+        # Each unit is 10 more bits, so the unit index follows from bit_length
+        units = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+        shift = min(max(0, (abs(size).bit_length() - 1) // 10), len(units) - 1)
+        return f"{size / (1 << (shift * 10)):.2f} {units[shift]}"
 
 
 async def run_scan(db: Database, mount_points: list[str],
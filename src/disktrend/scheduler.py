@@ -4,7 +4,7 @@ Handles periodic disk scans using APScheduler.
 """
 
 import asyncio
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Callable, Optional
 import logging
 
@@ -79,19 +79,19 @@ class ScanScheduler:
         """Execute scheduled scan."""
         logger.info("Starting scheduled scan")
         await self._notify_status('scan_started', {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
             'scheduled': True
         })
 
         try:
             await self.trigger_scan()
             await self._notify_status('scan_completed', {
-                'timestamp': datetime.now().isoformat()
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds')
             })
         except Exception as e:
             logger.exception(f"Scheduled scan failed: {e}")
             await self._notify_status('scan_failed', {
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
                 'error': str(e)
             })
 
@@ -5,20 +5,31 @@ Provides REST API and serves the web dashboard.
 
 import os
 import sys
+import time
 import asyncio
 import logging
+import functools
+import contextlib
+from collections import OrderedDict
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
 from contextlib import asynccontextmanager
 
 import yaml
+import orjson
 import psutil
-from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import Body, FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 from .models import Database
 from .scheduler import ScanScheduler
 
@@ -33,18 +44,67 @@ logger = logging.getLogger(__name__)
 db: Optional[Database] = None
 scheduler: Optional[ScanScheduler] = None
 config: dict = {}
+# Hot config values, resolved once in lifespan
+_MOUNT_POINTS: tuple[str, ...] = ('/',)
+_SCHED_ENABLED: bool = True
 websocket_clients: set[WebSocket] = set()
-
-
+# Manual scan task; held here so it isn't garbage collected mid-run
+_scan_task: Optional[asyncio.Task] = None
+
+# Idle WebSocket clients are pinged this often so dead sockets get pruned
+WS_HEARTBEAT_INTERVAL = 20.0
+
+# Dashboard page, read once at startup
+_index_html: Optional[str] = None
+
+# Disk usage per mount point, encoded once per tick by a background sampler
+# task and spliced as-is into every response until the next one
+DISK_SAMPLE_INTERVAL = 5.0
+_disk_usage_json = orjson.Fragment(b'[]')
+
+# Short-lived cache for snapshot-derived dashboard data, keyed by endpoint
+# and the snapshot ids it depends on. Bounded LRU, cleared on scan end.
+RESPONSE_CACHE_TTL = 30.0
+RESPONSE_CACHE_SIZE = 32
+_response_cache: OrderedDict[tuple, tuple[float, dict]] = OrderedDict()
+# Responses currently being built, so concurrent cache misses share one
+_inflight: dict[tuple, asyncio.Future] = {}
+
+
+def _cache_get(key: tuple) -> Optional[dict]:
+    """Return a cached response if present and still fresh."""
+    hit = _response_cache.get(key)
+    if hit is None:
+        return None
+    stored_at, response = hit
+    if time.monotonic() - stored_at >= RESPONSE_CACHE_TTL:
+        del _response_cache[key]
+        return None
+    _response_cache.move_to_end(key)
+    return response
+
+
+def _cache_put(key: tuple, response: dict):
+    """Store a response, evicting the least recently used beyond the cap."""
+    _response_cache[key] = (time.monotonic(), response)
+    _response_cache.move_to_end(key)
+    while len(_response_cache) > RESPONSE_CACHE_SIZE:
+        _response_cache.popitem(last=False)
+
+
+@functools.lru_cache(maxsize=4)
 def load_config(config_path: str = None) -> dict:
-    """Load configuration from YAML file or environment."""
+    """Load configuration from YAML file or environment.
+
+    The result is cached per path, so callers must treat it as read-only.
+    """
     # Default config path
     if not config_path:
         config_path = os.environ.get('DISKTREND_CONFIG', 'config.yaml')
 
     cfg = {
         'server': {'host': '0.0.0.0', 'port': 8080},
-        'database': {'path': './data/disktrend.db'},
+        'database': {'path': './data/disktrend.db', 'pool_size': 5},
         'scanner': {
             'mount_points': ['/'],
             'skip_paths': ['/proc', '/sys', '/dev', '/run', '/snap', '/tmp'],
@@ -58,18 +118,17 @@ def load_config(config_path: str = None) -> dict:
         'retention': {'days': 365}
     }
 
-    if os.path.exists(config_path):
+    try:
         with open(config_path, 'r') as f:
-            file_config = yaml.safe_load(f) or {}
-            # Deep merge
-            for key, value in file_config.items():
-                if isinstance(value, dict) and key in cfg:
-                    cfg[key].update(value)
-                else:
-                    cfg[key] = value
-        logger.info(f"Loaded config from {config_path}")
-    else:
+            file_config = yaml.load(f, Loader=SafeLoader) or {}
+    except FileNotFoundError:
         logger.warning(f"Config file not found: {config_path}, using defaults")
+        return cfg
+
+    # Merge each section over its defaults
+    for key, value in file_config.items():
+        cfg[key] = {**cfg.get(key, {}), **value} if isinstance(value, dict) else value
+    logger.info(f"Loaded config from {config_path}")
 
     return cfg
 
@@ -77,14 +136,16 @@ def load_config(config_path: str = None) -> dict:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler."""
-    global db, scheduler, config
+    global db, scheduler, config, _index_html, _MOUNT_POINTS, _SCHED_ENABLED
 
     # Load config
     config = load_config()
+    _MOUNT_POINTS = tuple(config.get('scanner', {}).get('mount_points', ['/']))
+    _SCHED_ENABLED = bool(config.get('scheduler', {}).get('enabled', True))
 
     # Initialize database
     db_path = config['database']['path']
-    db = Database(db_path)
+    db = Database(db_path, pool_size=config['database'].get('pool_size', 5))
     logger.info(f"Database initialized at {db_path}")
 
     # Initialize scheduler
@@ -92,11 +153,34 @@ async def lifespan(app: FastAPI):
     scheduler.set_status_callback(broadcast_status)
     scheduler.start()
 
+    _index_html = _load_index_html()
+
+    # Sample disk usage in the background instead of per request
+    sampler = asyncio.create_task(_sample_disk_usage(_MOUNT_POINTS))
+
     yield
 
     # Cleanup
+    sampler.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await sampler
+    if _scan_task and not _scan_task.done():
+        # Let the scan roll back and mark its snapshot failed before the
+        # database closes underneath it
+        _scan_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _scan_task
     if scheduler:
         scheduler.stop()
+    if db:
+        await db.close()
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response encoded with orjson, much faster on large entry lists."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
 
 
 # Create FastAPI app
@@ -104,9 +188,13 @@ app = FastAPI(
     title="DiskTrend Web",
     description="Linux Storage Analyzer with Web Dashboard",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
+# Entry listings are large and compress well (shared path prefixes)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 
 # Pydantic models
 class ScanRequest(BaseModel):
@@ -121,46 +209,88 @@ class PathQuery(BaseModel):
 # WebSocket broadcast
 async def broadcast_status(event: str, data: dict):
     """Broadcast status to all connected WebSocket clients."""
-    message = {'event': event, 'data': data, 'timestamp': datetime.now().isoformat()}
-    disconnected = set()
-    for ws in websocket_clients:
+    if event == 'scan_completed':
+        # New snapshot data: drop cached dashboard responses
+        _response_cache.clear()
+    if not websocket_clients:
+        return
+    if event == 'scan_completed':
+        # Push the fresh overview (also warming the cache) so every
+        # dashboard doesn't fetch /api/overview at once
         try:
-            await ws.send_json(message)
-        except Exception:
-            disconnected.add(ws)
-    websocket_clients.difference_update(disconnected)
+            data = {**data, 'overview': await _overview()}
+        except Exception as e:
+            logger.warning(f"Failed to build overview for broadcast: {e}")
+    # Encode once and send to every client concurrently, so one slow
+    # socket doesn't hold up the rest
+    timestamp = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    payload = orjson.dumps(
+        {'event': event, 'data': data, 'timestamp': timestamp},
+        default=str
+    ).decode()
+    clients = list(websocket_clients)
+    results = await asyncio.gather(
+        *(ws.send_text(payload) for ws in clients),
+        return_exceptions=True
+    )
+    websocket_clients.difference_update(
+        ws for ws, result in zip(clients, results)
+        if isinstance(result, Exception)
+    )
+
+
+async def _get_disk_info(mount_points: tuple[str, ...]) -> list[dict]:
+    """Get disk usage for each mount point, off the event loop."""
+    usages = await asyncio.gather(
+        *(asyncio.to_thread(psutil.disk_usage, mount) for mount in mount_points),
+        return_exceptions=True
+    )
+    disk_info = []
+    for mount, usage in zip(mount_points, usages):
+        if isinstance(usage, Exception):
+            logger.warning(f"Could not get disk usage for {mount}: {usage}")
+            continue
+        disk_info.append({
+            'mount_point': mount,
+            'total': usage.total,
+            'used': usage.used,
+            'free': usage.free,
+            'percent': usage.percent
+        })
+    return disk_info
+
+
+async def _sample_disk_usage(mount_points: tuple[str, ...]):
+    """Keep _disk_usage_json up to date until cancelled."""
+    global _disk_usage_json
+    # Mounts that fail a tick keep their last good sample
+    samples: dict[str, dict] = {}
+    while True:
+        for info in await _get_disk_info(mount_points):
+            samples[info['mount_point']] = info
+        _disk_usage_json = orjson.Fragment(orjson.dumps(list(samples.values())))
+        await asyncio.sleep(DISK_SAMPLE_INTERVAL)
 
 
 # API Routes
 @app.get("/api/status")
 async def get_status():
     """Get system and scan status."""
-    # Get disk usage info
-    disk_info = []
-    for mount in config.get('scanner', {}).get('mount_points', ['/']):
-        try:
-            usage = psutil.disk_usage(mount)
-            disk_info.append({
-                'mount_point': mount,
-                'total': usage.total,
-                'used': usage.used,
-                'free': usage.free,
-                'percent': usage.percent
-            })
-        except Exception as e:
-            logger.warning(f"Could not get disk usage for {mount}: {e}")
-
-    # Get latest snapshot info
-    latest = await db.get_latest_snapshot()
-    running = await db.get_running_snapshot()
+    latest, running = await asyncio.gather(
+        db.get_latest_snapshot(),
+        db.get_running_snapshot()
+    )
+    next_run = scheduler.get_next_run()
 
-    return {
-        'disk_info': disk_info,
+    # Returned as a response so the pre-encoded disk usage skips
+    # FastAPI's jsonable_encoder, which can't handle orjson fragments
+    return ORJSONResponse({
+        'disk_info': _disk_usage_json,
         'latest_snapshot': latest,
         'running_scan': running,
-        'next_scan': scheduler.get_next_run().isoformat() if scheduler.get_next_run() else None,
-        'scheduler_enabled': config.get('scheduler', {}).get('enabled', True)
-    }
+        'next_scan': next_run.isoformat() if next_run else None,
+        'scheduler_enabled': _SCHED_ENABLED
+    })
 
 
 @app.get("/api/snapshots")
@@ -177,14 +307,10 @@ async def get_snapshots(
 @app.get("/api/snapshot/{snapshot_id}")
 async def get_snapshot(snapshot_id: int):
     """Get details for a specific snapshot."""
-    async with db.connection() as conn:
-        cursor = await conn.execute(
-            "SELECT * FROM snapshots WHERE id = ?", (snapshot_id,)
-        )
-        row = await cursor.fetchone()
-        if not row:
-            raise HTTPException(404, "Snapshot not found")
-        return dict(row)
+    snapshot = await db.get_snapshot_by_id(snapshot_id)
+    if not snapshot:
+        raise HTTPException(404, "Snapshot not found")
+    return snapshot
 
 
 @app.get("/api/snapshot/{snapshot_id}/entries")
@@ -193,9 +319,26 @@ async def get_snapshot_entries(
     parent_path: str = Query(default=None),
     depth: int = Query(default=None, ge=0)
 ):
-    """Get directory entries for a snapshot."""
-    entries = await db.get_entries(snapshot_id, parent_path, depth)
-    return {'entries': entries}
+    """Get directory entries for a snapshot, streamed as they are read."""
+    return StreamingResponse(
+        _stream_entries(snapshot_id, parent_path, depth),
+        media_type="application/json"
+    )
+
+
+async def _stream_entries(snapshot_id: int, parent_path: Optional[str],
+                          depth: Optional[int]):
+    """Encode entry chunks into a {"entries": [...]} body piece by piece."""
+    yield b'{"entries":['
+    separator = b''
+    async with contextlib.aclosing(
+        db.iter_entries(snapshot_id, parent_path, depth)
+    ) as chunks:
+        async for chunk in chunks:
+            # Strip the list brackets so chunks join into one array
+            yield separator + orjson.dumps(chunk)[1:-1]
+            separator = b','
+    yield b']}'
 
 
 @app.get("/api/snapshot/{snapshot_id}/errors")
@@ -262,6 +405,12 @@ async def get_top_growth(
 @app.get("/api/overview")
 async def get_overview():
     """Get dashboard overview data."""
+    # A response, like get_status, so the disk usage fragment passes through
+    return ORJSONResponse(await _overview())
+
+
+async def _overview() -> dict:
+    """Build the overview payload, shared with the scan_completed broadcast."""
     # Get latest snapshot
     latest = await db.get_latest_snapshot()
     if not latest:
@@ -270,47 +419,58 @@ async def get_overview():
             'message': 'No scans completed yet. Run a scan to see data.'
         }
 
-    # Get top-level directories (children of mount point)
-    mount_point = latest.get('mount_point', '/')
-    top_entries = await db.get_entries(latest['id'], parent_path=mount_point)
+    cache_key = ('overview', latest['id'])
+    response = _cache_get(cache_key)
+    if response is None:
+        # Concurrent misses share one build instead of each hitting the DB.
+        # Shielded so a cancelled caller doesn't cancel it for the others.
+        task = _inflight.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(_build_overview(latest, cache_key))
+            _inflight[cache_key] = task
+            task.add_done_callback(lambda _: _inflight.pop(cache_key, None))
+        response = await asyncio.shield(task)
 
-    # Get growth data
-    growth = await db.get_top_growth(10)
+    # Disk usage is added per request rather than cached, so it is never
+    # older than one sampler interval
+    return {**response, 'disk_usage': _disk_usage_json}
 
-    # Get disk usage
-    disk_info = []
-    for mount in config.get('scanner', {}).get('mount_points', ['/']):
-        try:
-            usage = psutil.disk_usage(mount)
-            disk_info.append({
-                'mount_point': mount,
-                'total': usage.total,
-                'used': usage.used,
-                'free': usage.free,
-                'percent': usage.percent
-            })
-        except Exception:
-            pass
 
-    return {
+async def _build_overview(latest: dict, cache_key: tuple) -> dict:
+    """Query the overview for a snapshot and store it in the response cache.
+
+    Disk usage is left out; _overview adds the current sample.
+    """
+    # Top-level directories (children of mount point) and growth data
+    # don't depend on each other; fetch them concurrently
+    mount_point = latest.get('mount_point', '/')
+    top_entries, growth = await asyncio.gather(
+        db.get_entries(latest['id'], parent_path=mount_point),
+        db.get_top_growth(10)
+    )
+
+    response = {
         'has_data': True,
         'snapshot': latest,
         'top_directories': top_entries[:20],  # Top 20 by size
-        'top_growth': growth,
-        'disk_usage': disk_info
+        'top_growth': growth
     }
+    _cache_put(cache_key, response)
+    return response
 
 
 @app.post("/api/scan")
-async def trigger_scan(request: ScanRequest = None):
+async def trigger_scan(request: Optional[ScanRequest] = Body(None)):
     """Trigger a manual scan."""
+    global _scan_task
+
     if await scheduler.is_scan_running():
         raise HTTPException(409, "A scan is already in progress")
 
     mount_points = request.mount_points if request else None
 
     # Run scan in background
-    asyncio.create_task(_run_scan_task(mount_points))
+    _scan_task = asyncio.create_task(_run_scan_task(mount_points), name='scan')
 
     return {'status': 'started', 'message': 'Scan started in background'}
 
@@ -320,18 +480,18 @@ async def _run_scan_task(mount_points: list[str] = None):
     try:
         logger.info("Background scan task started")
         await broadcast_status('scan_started', {
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds')
         })
         results = await scheduler.trigger_scan(mount_points)
         logger.info(f"Background scan task completed, broadcasting completion")
         await broadcast_status('scan_completed', {
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds')
         })
         logger.info("Scan completion broadcast sent")
     except Exception as e:
         logger.exception(f"Scan task failed: {e}")
         await broadcast_status('scan_failed', {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
             'error': str(e)
         })
 
@@ -341,29 +501,54 @@ async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time updates."""
     await websocket.accept()
     websocket_clients.add(websocket)
+    receive = None
     try:
         while True:
-            # Keep connection alive
-            data = await websocket.receive_text()
+            # Keep one pending receive across heartbeats rather than
+            # cancelling it on every timeout
+            if receive is None:
+                receive = asyncio.ensure_future(websocket.receive_text())
+            done, _ = await asyncio.wait({receive}, timeout=WS_HEARTBEAT_INTERVAL)
+            if not done:
+                # Idle client: a failed ping means the socket is gone
+                await websocket.send_text('ping')
+                continue
+            data = receive.result()
+            receive = None
             # Echo ping/pong
             if data == 'ping':
                 await websocket.send_text('pong')
     except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.debug(f"WebSocket client dropped: {e}")
+    finally:
+        if receive is not None:
+            receive.cancel()
         websocket_clients.discard(websocket)
 
 
-# Serve frontend
-@app.get("/", response_class=HTMLResponse)
-async def serve_dashboard():
-    """Serve the main dashboard page."""
+def _load_index_html() -> Optional[str]:
+    """Read the dashboard template from the package tree or working directory."""
     template_path = Path(__file__).parent.parent.parent / "templates" / "index.html"
     if template_path.exists():
-        return template_path.read_text()
+        return template_path.read_text(encoding='utf-8')
 
     # Fallback: check relative to working directory
     alt_path = Path("templates/index.html")
     if alt_path.exists():
-        return alt_path.read_text()
+        return alt_path.read_text(encoding='utf-8')
+
+    logger.warning("Dashboard template not found")
+    return None
+
+
+# Serve frontend
+@app.get("/", response_class=HTMLResponse)
+async def serve_dashboard():
+    """Serve the main dashboard page."""
+    if _index_html is not None:
+        return HTMLResponse(_index_html)
 
     return HTMLResponse(
         "<h1>DiskTrend Web</h1><p>Template not found. Please ensure templates/index.html exists.</p>",
@@ -391,6 +576,8 @@ def main():
         host=host,
         port=port,
         reload=False,
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )
 